@@ -0,0 +1,114 @@
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+class _Restarted(Exception):
+    """Поэтапное копирование слишком часто начиналось заново из-за записей в базу"""
+
+class BackupManager:
+    """Онлайн-бэкап SQLite без остановки бота.
+    
+    Копирование идёт через backup API SQLite небольшими порциями страниц в отдельном
+    потоке и со своим соединением, поэтому event loop и общее соединение Database
+    не блокируются. Между шагами блокировка отпускается, и бот успевает писать.
+    
+    Запись в базу через другое соединение заставляет SQLite начать копирование
+    с первой страницы. Если это случилось max_restarts раз или копирование идёт
+    дольше max_time секунд, база копируется целиком одним шагом под блокировкой.
+    """
+    
+    def __init__(self, db_name, backup_dir=None, keep=7, pages=64, pause=0.005, max_restarts=3, max_time=30):
+        self.db_name = db_name
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(os.path.abspath(db_name)), 'backups')
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+        self.max_restarts = max_restarts
+        self.max_time = max_time
+        self.lock = asyncio.Lock()
+        self.last_result = None
+    
+    def _copy(self, target):
+        stats = {'steps': 0, 'lock_time': 0.0, 'max_step': 0.0, 'restarts': 0, 'one_step': False}
+        started = time.perf_counter()
+        source = sqlite3.connect(f"file:{os.path.abspath(self.db_name)}?mode=ro", uri=True)
+        destination = sqlite3.connect(target)
+        step_started = time.perf_counter()
+        last_remaining = None
+    
+        def record_step():
+            # Блокировка источника держится только внутри шага
+            step = time.perf_counter() - step_started
+            stats['steps'] += 1
+            stats['lock_time'] += step
+            stats['max_step'] = max(stats['max_step'], step)
+    
+        def progress(status, remaining, total):
+            nonlocal step_started, last_remaining
+            record_step()
+            # После перезапуска шаг снова копирует первые страницы, и остаток не уменьшается
+            if status == sqlite3.SQLITE_OK:
+                if last_remaining is not None and remaining >= last_remaining:
+                    stats['restarts'] += 1
+                last_remaining = remaining
+            if remaining and (stats['restarts'] >= self.max_restarts or time.perf_counter() - started > self.max_time):
+                raise _Restarted()
+            time.sleep(self.pause)
+            step_started = time.perf_counter()
+    
+        try:
+            try:
+                source.backup(destination, pages=self.pages, progress=progress)
+            except _Restarted:
+                # Один шаг нельзя прервать записью: бот подождёт его на блокировке
+                stats['one_step'] = True
+                step_started = time.perf_counter()
+                source.backup(destination)
+                record_step()
+            stats['integrity'] = destination.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            destination.close()
+            source.close()
+        stats['duration'] = time.perf_counter() - started
+        return stats
+    
+    def _rotate(self):
+        snapshots = sorted(name for name in os.listdir(self.backup_dir) if name.startswith('backup-') and name.endswith('.db'))
+        for name in snapshots[:-self.keep]:
+            os.remove(os.path.join(self.backup_dir, name))
+        return len(snapshots[-self.keep:])
+    
+    async def backup(self):
+        """Снять снимок базы, проверить его и удалить лишние старые снимки"""
+        async with self.lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            target = os.path.join(self.backup_dir, f"backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db")
+            # Снимок получает итоговое имя только после проверки, поэтому недописанный
+            # или испорченный файл не попадёт в ротацию и не вытеснит хорошие
+            temp = target + '.tmp'
+            try:
+                result = await asyncio.to_thread(self._copy, temp)
+                result['path'] = target
+                result['ok'] = result['integrity'] == 'ok'
+                if result['ok']:
+                    os.replace(temp, target)
+                    result['size'] = os.path.getsize(target)
+                    result['kept'] = await asyncio.to_thread(self._rotate)
+            finally:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            self.last_result = result
+            return result
+    
+    async def scheduler(self, interval_hours=24, on_done=None):
+        """Бэкап по расписанию; on_done(result) вызывается после каждого снимка"""
+        while True:
+            await asyncio.sleep(interval_hours * 3600)
+            try:
+                result = await self.backup()
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+            if on_done:
+                await on_done(result)
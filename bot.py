@@ -3,23 +3,43 @@ from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
 
 from database import Database
-from utils import validate_telegram_username, get_next_dates, get_time_slots
+from fsm_storage import TTLMemoryStorage
+from journal import UpdateJournal, JournalMiddleware
+from backup import BackupManager
+from memory_database import MemoryDatabase
+from profiler import SamplingProfiler
+from utils import validate_telegram_username, validate_time, get_next_dates, get_time_slots, get_reminder_date, parse_date_arg, text_bar
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 ADMIN_ID = int(os.getenv('ADMIN_ID', '0'))
+# sqlite - основное хранилище, memory - без диска, для тестов и замеров
+STORAGE = os.getenv('STORAGE', 'sqlite')
+APP_CACHE_SIZE = int(os.getenv('APP_CACHE_SIZE', '256'))
+# Брошенные анкеты забываются через FSM_TTL секунд, не больше FSM_MAX_SESSIONS одновременно
+FSM_TTL = int(os.getenv('FSM_TTL', '3600'))
+FSM_MAX_SESSIONS = int(os.getenv('FSM_MAX_SESSIONS', '10000'))
+# Снимки базы: каталог, сколько хранить и как часто снимать
+BACKUP_DIR = os.getenv('BACKUP_DIR')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', '24'))
 
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
-db = Database()
+fsm_storage = TTLMemoryStorage(ttl=FSM_TTL, max_sessions=FSM_MAX_SESSIONS)
+dp = Dispatcher(storage=fsm_storage)
+journal = UpdateJournal()
+dp.update.outer_middleware(JournalMiddleware(journal))
+db = MemoryDatabase() if STORAGE == 'memory' else Database(cache_size=APP_CACHE_SIZE)
+profiler = SamplingProfiler()
+# У хранилища в памяти нет файла, бэкапить нечего
+backups = BackupManager(db.db_name, BACKUP_DIR, BACKUP_KEEP) if STORAGE != 'memory' else None
 
 class States(StatesGroup):
     name = State()
@@ -28,6 +48,24 @@ class States(StatesGroup):
     date = State()
     time = State()
 
+class BulkStates(StatesGroup):
+    date = State()
+
+class RescheduleStates(StatesGroup):
+    date = State()
+    time = State()
+
+MY_PAGE_SIZE = 5
+# Длиннее REPORT_DAILY_DAYS отчёт строится по неделям, длиннее REPORT_MAX_DAYS не строится
+REPORT_DAILY_DAYS = 62
+REPORT_MAX_DAYS = 366
+STATUS_NAMES = {'new': '🆕 На рассмотрении', 'processed': '✅ Обработана', 'cancelled': '❌ Отменена'}
+
+# Выбранные заявки для массовых действий:
+# {admin_id: {'apps': [показанные], 'ids': [все подходящие], 'selected': set(), 'message_id': ...}}
+bulk_selection = {}
+BULK_SHOWN = 30
+
 def main_kb():
     return ReplyKeyboardMarkup(keyboard=[
         [KeyboardButton(text="📝 Запись на занятие")],
@@ -63,6 +101,40 @@ def time_kb():
 def cancel_kb():
     return ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="❌ Отмена")]], resize_keyboard=True)
 
+def bulk_kb(apps, selected, total):
+    rows = []
+    for app in apps:
+        mark = "☑️" if app[0] in selected else "⬜"
+        rows.append([InlineKeyboardButton(text=f"{mark} #{app[0]} {app[3]} | {app[5]}", callback_data=f"bulk_toggle_{app[0]}")])
+    rows.append([
+        InlineKeyboardButton(text=f"☑️ Все ({total})", callback_data="bulk_all"),
+        InlineKeyboardButton(text="⬜ Сбросить", callback_data="bulk_none")
+    ])
+    rows.append([
+        InlineKeyboardButton(text=f"✅ Обработать ({len(selected)})", callback_data="bulk_done"),
+        InlineKeyboardButton(text="🗑️ Удалить", callback_data="bulk_del"),
+        InlineKeyboardButton(text="📅 Перенести", callback_data="bulk_resched")
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def my_kb(apps, page, pages):
+    rows = []
+    for app in apps:
+        if app[10] != 'new':
+            continue
+        row = [InlineKeyboardButton(text=f"❌ Отменить #{app[0]}", callback_data=f"my_cancel_{app[0]}")]
+        if app[7]:
+            row.append(InlineKeyboardButton(text=f"📅 Перенести #{app[0]}", callback_data=f"my_resched_{app[0]}"))
+        rows.append(row)
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"my_page_{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"my_page_{page + 1}"))
+    if nav:
+        rows.append(nav)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
 def admin_app_kb(app_id):
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✅ Обработано", callback_data=f"done_{app_id}")],
@@ -83,6 +155,7 @@ async def help_cmd(message: types.Message):
     text += "/start - Начать работу\n"
     text += "/help - Показать справку\n"
     text += "/stats - Статистика заявок\n"
+    text += "/my - Мои заявки\n"
     text += "/cancel - Отменить текущее действие"
     
     # ====================
@@ -91,9 +164,13 @@ async def help_cmd(message: types.Message):
     if message.from_user.id == ADMIN_ID:
         text += "\n\n👨‍💼 КОМАНДЫ АДМИНА:\n"
         text += "/admin - Панель администратора\n"
+        text += "/profile [сек] - Профилирование бота\n"
         text += "/applications - Новые заявки\n"
         text += "/view_all - Все заявки\n"
         text += "/search [ID] - Найти заявку\n"
+        text += "/report [с] [по] - Отчёт по дням\n"
+        text += "/bulk [тип] - Массовые действия\n"
+        text += "/backup - Резервная копия базы\n"
         text += "/check_reminders - Проверить напоминания"
     
     await message.answer(text)
@@ -101,7 +178,7 @@ async def help_cmd(message: types.Message):
 @dp.message(Command("stats"))
 async def stats_cmd(message: types.Message):
     stats = db.get_stats()
-    await message.answer(f"📊 Статистика:\nВсего: {stats['total']}\nНовых: {stats['new']}\nОбработано: {stats['processed']}")
+    await message.answer(f"📊 Статистика:\nВсего: {stats['total']}\nНовых: {stats['new']}\nОбработано: {stats['processed']}\nОтменено: {stats['cancelled']}")
 
 @dp.message(Command("admin"))
 async def admin_cmd(message: types.Message):
@@ -118,6 +195,36 @@ async def admin_cmd(message: types.Message):
     ])
     await message.answer("👨‍💼 Админ-панель:", reply_markup=keyboard)
 
+@dp.message(Command("profile"))
+async def profile_cmd(message: types.Message):
+    if message.from_user.id != ADMIN_ID:
+        await message.answer("⛔ Нет доступа")
+        return
+    
+    args = message.text.split()
+    try:
+        seconds = int(args[1]) if len(args) > 1 else 30
+    except ValueError:
+        await message.answer("❌ Использование: /profile [секунды]")
+        return
+    seconds = max(1, min(seconds, 300))
+    
+    if profiler.running:
+        await message.answer("⏳ Профилирование уже идёт")
+        return
+    
+    await message.answer(f"⏱ Профилирование {seconds} с...")
+    report, collapsed = await profiler.run(seconds)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    await message.answer_document(
+        types.BufferedInputFile(report.encode(), filename=f"profile-{stamp}.txt"),
+        caption="📊 Горячие функции и медленные колбэки"
+    )
+    await message.answer_document(
+        types.BufferedInputFile(collapsed.encode(), filename=f"profile-{stamp}.collapsed"),
+        caption="🔥 Стеки для flamegraph.pl / speedscope"
+    )
+
 @dp.message(F.text.in_(["📝 Запись на занятие", "❓ Вопрос по курсу", "📋 Прочее"]))
 async def type_handler(message: types.Message, state: FSMContext):
     types_map = {
@@ -218,6 +325,13 @@ async def message_handler(message: types.Message, state: FSMContext):
     
     data = await state.get_data()
     
+    # Не плодим дубли: открытая заявка того же типа уже есть
+    existing = db.find_open_application(message.from_user.id, data['type'])
+    if existing:
+        await state.clear()
+        await message.answer(f"⚠️ У вас уже есть заявка #{existing[0]} на рассмотрении\nПосмотреть и изменить: /my", reply_markup=main_kb())
+        return
+    
     app_id = db.add_application(
         user_id=message.from_user.id,
         username=message.from_user.username or "",
@@ -301,7 +415,13 @@ async def admin_callback(callback: types.CallbackQuery):
     
     elif action == "admin_stats":
         stats = db.get_stats()
-        await callback.message.answer(f"📊 Всего: {stats['total']}\nНовых: {stats['new']}\nОбработано: {stats['processed']}")
+        text = f"📊 Всего: {stats['total']}\nНовых: {stats['new']}\nОбработано: {stats['processed']}\nОтменено: {stats['cancelled']}"
+        cache = db.cache_stats()
+        if cache:
+            text += f"\n\n🗂 Кэш заявок: {cache['size']}/{cache['max_size']}, попаданий {cache['hits']}, промахов {cache['misses']}"
+        sessions = fsm_storage.stats()
+        text += f"\n📝 Анкеты: активных {sessions['active']}, истекло {sessions['expired']}, вытеснено {sessions['evicted']}"
+        await callback.message.answer(text)
     
     elif action == "admin_search":
         await callback.message.answer("🔍 Использование:\n/search [ID]")
@@ -458,7 +578,8 @@ async def view_all_cmd(message: types.Message):
         return
     
     new = len([a for a in apps if a[10] == 'new'])
-    await message.answer(f"📋 Всего заявок: {len(apps)}\n🆕 Новых: {new}\n✅ Обработано: {len(apps)-new}")
+    processed = len([a for a in apps if a[10] == 'processed'])
+    await message.answer(f"📋 Всего заявок: {len(apps)}\n🆕 Новых: {new}\n✅ Обработано: {processed}\n❌ Отменено: {len(apps) - new - processed}")
 
 @dp.message(Command("check_reminders"))
 async def check_reminders_cmd(message: types.Message):
@@ -495,6 +616,358 @@ async def check_reminders_cmd(message: types.Message):
     text += f"\n📊 Отправлено: {sent_count} из {len(reminders)}"
     await message.answer(text)
 
+@dp.message(Command("report"))
+async def report_cmd(message: types.Message):
+    if message.from_user.id != ADMIN_ID:
+        await message.answer("⛔ Нет доступа")
+        return
+    
+    args = message.text.split()
+    if len(args) < 3:
+        await message.answer("❌ Использование: /report [с] [по]\nПример: /report 01.01.2026 31.01.2026")
+        return
+    
+    date_from, date_to = parse_date_arg(args[1]), parse_date_arg(args[2])
+    if not date_from or not date_to or date_from > date_to:
+        await message.answer("❌ Неверный период\nПример: /report 01.01.2026 31.01.2026")
+        return
+    span = (datetime.strptime(date_to, '%Y-%m-%d') - datetime.strptime(date_from, '%Y-%m-%d')).days + 1
+    if span > REPORT_MAX_DAYS:
+        await message.answer(f"❌ Период слишком длинный: не больше {REPORT_MAX_DAYS} дней")
+        return
+    
+    days = db.get_daily_report(date_from, date_to)
+    if not days:
+        await message.answer("📭 Нет данных за период")
+        return
+    
+    total = sum(d['total'] for d in days.values())
+    processed = sum(d['processed'] for d in days.values())
+    cancelled = sum(d['cancelled'] for d in days.values())
+    booked = sum(d['booked'] for d in days.values())
+    no_show = sum(d['no_show'] for d in days.values())
+    types_total = {}
+    for d in days.values():
+        for app_type, count in d['types'].items():
+            types_total[app_type] = types_total.get(app_type, 0) + count
+    
+    # Для длинных периодов строки по неделям, чтобы отчёт влез в одно сообщение
+    buckets = {}
+    for day, d in days.items():
+        day_obj = datetime.strptime(day, '%Y-%m-%d')
+        if span > REPORT_DAILY_DAYS:
+            day_obj -= timedelta(days=day_obj.weekday())
+        bucket = buckets.setdefault(day_obj, {'total': 0, 'booked': 0})
+        bucket['total'] += d['total']
+        bucket['booked'] += d['booked']
+    
+    max_total = max(b['total'] for b in buckets.values())
+    text = f"📈 Отчёт {args[1]} — {args[2]}"
+    text += " (по неделям)\n\n" if span > REPORT_DAILY_DAYS else "\n\n"
+    for day_obj in sorted(buckets):
+        b = buckets[day_obj]
+        text += f"{day_obj.strftime('%d.%m')} {text_bar(b['total'], max_total)} {b['total']}"
+        if b['booked']:
+            text += f" 📅{b['booked']}"
+        text += "\n"
+    
+    text += f"\n📋 Всего: {total}\n"
+    for app_type, count in sorted(types_total.items()):
+        text += f"• {app_type}: {count}\n"
+    if total:
+        text += f"✅ Обработано: {processed} ({processed * 100 // total}%)\n"
+        text += f"❌ Отменено: {cancelled} ({cancelled * 100 // total}%)\n"
+    if booked:
+        text += f"📅 Записей на даты: {booked}\n"
+        text += f"🚫 Неявки: {no_show} ({no_show * 100 // booked}%)"
+    
+    await message.answer(text)
+
+def backup_text(result):
+    if not result.get('ok'):
+        return f"❌ Бэкап не удался: {result.get('error') or result.get('integrity')}"
+    text = f"💾 Бэкап готов: {os.path.basename(result['path'])}\n"
+    text += f"📦 Размер: {result['size'] // 1024} КБ, снимков хранится: {result['kept']}\n"
+    text += f"⏱ Длительность: {result['duration']:.2f} с\n"
+    text += f"🔒 Блокировка: {result['lock_time'] * 1000:.0f} мс всего, макс. шаг {result['max_step'] * 1000:.0f} мс ({result['steps']} шагов)"
+    if result['restarts']:
+        text += f"\n🔁 Перезапусков из-за записей: {result['restarts']}" + (", копия снята одним шагом" if result['one_step'] else "")
+    return text
+
+@dp.message(Command("backup"))
+async def backup_cmd(message: types.Message):
+    if message.from_user.id != ADMIN_ID:
+        await message.answer("⛔ Нет доступа")
+        return
+    
+    if not backups:
+        await message.answer("❌ Бэкап недоступен для хранилища в памяти")
+        return
+    if backups.lock.locked():
+        await message.answer("⏳ Бэкап уже выполняется")
+        return
+    
+    await message.answer("💾 Создаю резервную копию...")
+    try:
+        result = await backups.backup()
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)}
+    await message.answer(backup_text(result))
+
+async def on_scheduled_backup(result):
+    print(backup_text(result))
+    if not result.get('ok'):
+        try:
+            await bot.send_message(ADMIN_ID, backup_text(result))
+        except:
+            pass
+
+# ====================
+# МАССОВЫЕ ДЕЙСТВИЯ
+# ====================
+@dp.message(Command("bulk"))
+async def bulk_cmd(message: types.Message):
+    if message.from_user.id != ADMIN_ID:
+        await message.answer("⛔ Нет доступа")
+        return
+    
+    args = message.text.split(maxsplit=1)
+    apps = db.get_applications('new')
+    if len(args) > 1:
+        apps = [app for app in apps if app[5] == args[1].strip().lower()]
+    if not apps:
+        await message.answer("📭 Нет новых заявок")
+        return
+    
+    # Показываем первые BULK_SHOWN, но «Все» выбирает каждую подходящую заявку
+    selection = {'apps': apps[:BULK_SHOWN], 'ids': [app[0] for app in apps], 'selected': set()}
+    header = f"📦 Выберите заявки (показано {len(selection['apps'])} из {len(apps)}):"
+    sent = await message.answer(header, reply_markup=bulk_kb(selection['apps'], set(), len(apps)))
+    selection['message_id'] = sent.message_id
+    bulk_selection[message.from_user.id] = selection
+
+@dp.callback_query(lambda c: c.data.startswith("bulk_"))
+async def bulk_callback(callback: types.CallbackQuery, state: FSMContext):
+    if callback.from_user.id != ADMIN_ID:
+        await callback.answer("Нет доступа")
+        return
+    
+    selection = bulk_selection.get(callback.from_user.id)
+    if not selection or selection['message_id'] != callback.message.message_id:
+        await callback.answer("Список устарел, вызовите /bulk")
+        return
+    
+    action = callback.data
+    selected = selection['selected']
+    before = set(selected)
+    
+    if action.startswith("bulk_toggle_"):
+        app_id = int(action.split("_")[2])
+        selected.symmetric_difference_update({app_id})
+    elif action == "bulk_all":
+        selected.update(selection['ids'])
+    elif action == "bulk_none":
+        selected.clear()
+    elif not selected:
+        await callback.answer("Ничего не выбрано")
+        return
+    elif action == "bulk_done":
+        count = db.bulk_update_status(sorted(selected), "processed")
+        await finish_bulk(callback.from_user.id, bulk_result("✅ Обработано заявок", count, len(selected)))
+        await callback.answer()
+        return
+    elif action == "bulk_del":
+        count = db.bulk_delete(sorted(selected))
+        await finish_bulk(callback.from_user.id, bulk_result("🗑️ Удалено заявок", count, len(selected)))
+        await callback.answer()
+        return
+    elif action == "bulk_resched":
+        await state.set_state(BulkStates.date)
+        await callback.message.answer("📅 Новая дата и время:\nПример: 30.01.2026 14:00", reply_markup=cancel_kb())
+        await callback.answer()
+        return
+    
+    # Telegram отвергает правку без изменений
+    if selected != before:
+        await callback.message.edit_reply_markup(reply_markup=bulk_kb(selection['apps'], selected, len(selection['ids'])))
+    await callback.answer()
+
+@dp.message(BulkStates.date)
+async def bulk_date_handler(message: types.Message, state: FSMContext):
+    if message.text == "❌ Отмена":
+        await state.clear()
+        await message.answer("❌ Отменено", reply_markup=main_kb())
+        return
+    
+    selection = bulk_selection.get(message.from_user.id)
+    if not selection or not selection['selected']:
+        await state.clear()
+        await message.answer("❌ Ничего не выбрано, вызовите /bulk", reply_markup=main_kb())
+        return
+    
+    args = (message.text or "").split()
+    date_str = parse_date_arg(args[0]) if args else None
+    time_str = args[1] if len(args) > 1 else None
+    if not date_str or date_str < datetime.now().strftime('%Y-%m-%d') or (time_str and not validate_time(time_str)):
+        await message.answer("❌ Неверная дата или время\nПример: 30.01.2026 14:00", reply_markup=cancel_kb())
+        return
+    
+    await state.clear()
+    ids = sorted(selection['selected'])
+    count = db.bulk_reschedule(ids, date_str, time_str, get_reminder_date(date_str))
+    date_display = datetime.strptime(date_str, '%Y-%m-%d').strftime('%d.%m.%Y')
+    when = date_display + (f" ⏰ {time_str}" if time_str else "")
+    summary = bulk_result(f"📅 Перенесено на {when} заявок", count, len(ids), "без даты записи или уже не новые")
+    await finish_bulk(message.from_user.id, summary)
+    await message.answer("✅ Готово", reply_markup=main_kb())
+
+def bulk_result(done_text, count, total, skipped_reason="уже не новые"):
+    """Итог массового действия: сколько заявок изменено и сколько пропущено"""
+    if count is None:
+        return "❌ Ошибка, изменения отменены"
+    text = f"{done_text}: {count}"
+    if count < total:
+        # Пока админ выбирал, часть заявок отменили или обработали
+        text += f"\n⏭ Пропущено: {total - count} ({skipped_reason})"
+    return text
+
+async def finish_bulk(admin_id, summary):
+    """Заменить список выбора итоговым сообщением"""
+    selection = bulk_selection.pop(admin_id, None)
+    if not selection:
+        return
+    selected = sorted(selection['selected'])
+    ids = ", ".join(f"#{app_id}" for app_id in selected[:BULK_SHOWN])
+    if len(selected) > BULK_SHOWN:
+        ids += f" и ещё {len(selected) - BULK_SHOWN}"
+    await bot.edit_message_text(f"{summary}\n{ids}", chat_id=admin_id, message_id=selection['message_id'])
+
+# ====================
+# ЗАЯВКИ ПОЛЬЗОВАТЕЛЯ
+# ====================
+def my_page(user_id, page):
+    """Текст и клавиатура страницы /my"""
+    total = db.count_user_applications(user_id)
+    pages = max(1, (total + MY_PAGE_SIZE - 1) // MY_PAGE_SIZE)
+    page = max(0, min(page, pages - 1))
+    apps = db.get_user_applications(user_id, MY_PAGE_SIZE, page * MY_PAGE_SIZE)
+    if not apps:
+        return "📭 У вас пока нет заявок", None
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    text = f"📂 Ваши заявки ({total}), стр. {page + 1}/{pages}:\n\n"
+    for app in apps:
+        text += f"#{app[0]} | {app[5]} | {STATUS_NAMES.get(app[10], app[10])}\n"
+        if app[7]:
+            date_display = datetime.strptime(app[7], '%Y-%m-%d').strftime('%d.%m.%Y')
+            text += f"{'📅' if app[7] >= today else '🗓'} {date_display}"
+            if app[8]:
+                text += f" ⏰ {app[8]}"
+            text += "\n"
+        text += f"💬 {app[6][:50]}\n\n"
+    return text, my_kb(apps, page, pages)
+
+def own_open_application(user_id, app_id):
+    app = db.get_application_by_id(app_id)
+    if app and app[1] == user_id and app[10] == 'new':
+        return app
+    return None
+
+@dp.message(Command("my"))
+async def my_cmd(message: types.Message):
+    text, keyboard = my_page(message.from_user.id, 0)
+    await message.answer(text, reply_markup=keyboard)
+
+@dp.callback_query(lambda c: c.data.startswith("my_"))
+async def my_callback(callback: types.CallbackQuery, state: FSMContext):
+    user_id = callback.from_user.id
+    action = callback.data
+    
+    if action.startswith("my_page_"):
+        text, keyboard = my_page(user_id, int(action.split("_")[2]))
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        await callback.answer()
+        return
+    
+    app_id = int(action.split("_")[2])
+    if not own_open_application(user_id, app_id):
+        await callback.answer("Заявку уже нельзя изменить")
+        return
+    
+    if action.startswith("my_cancel_"):
+        db.cancel_application(app_id)
+        await callback.answer("❌ Заявка отменена")
+        text, keyboard = my_page(user_id, 0)
+        await callback.message.edit_text(text, reply_markup=keyboard)
+        try:
+            await bot.send_message(ADMIN_ID, f"❌ Пользователь отменил заявку #{app_id}")
+        except:
+            pass
+    
+    elif action.startswith("my_resched_"):
+        await state.clear()
+        await state.update_data(reschedule_id=app_id)
+        await state.set_state(RescheduleStates.date)
+        await callback.message.answer(f"📅 Новая дата для заявки #{app_id}:", reply_markup=date_kb())
+        await callback.answer()
+
+@dp.message(RescheduleStates.date)
+async def reschedule_date_handler(message: types.Message, state: FSMContext):
+    if message.text in ("❌ Отмена", "❌ Без даты"):
+        await state.clear()
+        await message.answer("❌ Перенос отменён", reply_markup=main_kb())
+        return
+    
+    date_str = parse_date_arg(message.text or "")
+    if not date_str or date_str < datetime.now().strftime('%Y-%m-%d'):
+        await message.answer("❌ Неверная дата\nПример: 30.01.2026", reply_markup=date_kb())
+        return
+    
+    await state.update_data(date=date_str)
+    await state.set_state(RescheduleStates.time)
+    await message.answer("⏰ Выберите время:", reply_markup=time_kb())
+
+@dp.message(RescheduleStates.time)
+async def reschedule_time_handler(message: types.Message, state: FSMContext):
+    if message.text == "❌ Отмена":
+        await state.clear()
+        await message.answer("❌ Перенос отменён", reply_markup=main_kb())
+        return
+    
+    time_str = None if message.text == "❌ Без времени" else message.text
+    if time_str and not validate_time(time_str):
+        await message.answer("❌ Неверное время\nПример: 14:00", reply_markup=time_kb())
+        return
+    
+    data = await state.get_data()
+    await state.clear()
+    app_id = data['reschedule_id']
+    if not own_open_application(message.from_user.id, app_id):
+        await message.answer("❌ Заявку уже нельзя изменить", reply_markup=main_kb())
+        return
+    
+    db.bulk_reschedule([app_id], data['date'], time_str, get_reminder_date(data['date']))
+    date_display = datetime.strptime(data['date'], '%Y-%m-%d').strftime('%d.%m.%Y')
+    when = date_display + (f" ⏰ {time_str}" if time_str else "")
+    await message.answer(f"✅ Заявка #{app_id} перенесена на {when}", reply_markup=main_kb())
+    try:
+        await bot.send_message(ADMIN_ID, f"📅 Пользователь перенёс заявку #{app_id} на {when}", reply_markup=admin_app_kb(app_id))
+    except:
+        pass
+
+# ====================
+# ИСТЁКШИЕ АНКЕТЫ
+# ====================
+# Регистрируется последним: срабатывает только если сообщение не подошло другим обработчикам
+async def session_expired(message: types.Message, state: FSMContext, raw_state):
+    if raw_state is not None or (message.text or "").startswith("/"):
+        return False
+    return fsm_storage.pop_expired(state.key)
+
+@dp.message(session_expired)
+async def session_expired_handler(message: types.Message):
+    await message.answer("⌛ Сессия истекла, начните заново", reply_markup=main_kb())
+
 async def check_reminders():
     """Функция для автоматической проверки напоминаний"""
     while True:
@@ -523,9 +996,19 @@ async def main():
     
     # Запускаем фоновую задачу для проверки напоминаний
     asyncio.create_task(check_reminders())
-    
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    # И фоновую очистку брошенных анкет
+    asyncio.create_task(fsm_storage.sweeper())
+    asyncio.create_task(journal.compactor())
+    if backups:
+        asyncio.create_task(backups.scheduler(BACKUP_INTERVAL_HOURS, on_scheduled_backup))
+    
+    # Апдейты, пришедшие во время перезапуска, не выбрасываем, но долгие админские команды не повторяем
+    journal.replay(dp, bot, skip_commands=('/profile', '/backup'))
+    await bot.delete_webhook(drop_pending_updates=False)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        journal.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
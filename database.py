@@ -1,10 +1,14 @@
 import sqlite3
 from datetime import datetime
 
-class Database:
-    def __init__(self, db_name='applications.db'):
+from storage import Storage, LRUCache
+
+class Database(Storage):
+    def __init__(self, db_name='applications.db', cache_size=256):
+        self.db_name = db_name
         self.conn = sqlite3.connect(db_name, check_same_thread=False)
         self.cursor = self.conn.cursor()
+        self.cache = LRUCache(cache_size)
         self.init_db()
     
     def init_db(self):
@@ -31,8 +35,73 @@ class Database:
                 sent INTEGER DEFAULT 0
             )
         ''')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_applications_user ON applications(user_id, created_at)')
+        self.init_rollups()
         self.conn.commit()
     
+    def init_rollups(self):
+        """Таблицы дневной статистики: по дате создания и по дате записи"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_stats (
+                day TEXT,
+                app_type TEXT,
+                status TEXT,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (day, app_type, status)
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS booked_stats (
+                day TEXT,
+                status TEXT,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (day, status)
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        self.cursor.execute("SELECT value FROM meta WHERE key = 'rollups_backfilled'")
+        if self.cursor.fetchone():
+            return
+        # Однократное заполнение из уже накопленных заявок
+        self.cursor.execute('DELETE FROM daily_stats')
+        self.cursor.execute('DELETE FROM booked_stats')
+        self.cursor.execute('''
+            INSERT INTO daily_stats (day, app_type, status, count)
+            SELECT date(created_at), app_type, status, COUNT(*)
+            FROM applications GROUP BY date(created_at), app_type, status
+        ''')
+        self.cursor.execute('''
+            INSERT INTO booked_stats (day, status, count)
+            SELECT appointment_date, status, COUNT(*)
+            FROM applications WHERE appointment_date IS NOT NULL
+            GROUP BY appointment_date, status
+        ''')
+        self.cursor.execute("INSERT INTO meta (key, value) VALUES ('rollups_backfilled', '1')")
+    
+    def _bump_rollups(self, rows, delta):
+        """Изменить счётчики дневной статистики для строк (created_at, app_type, status, appointment_date)"""
+        self.cursor.executemany('''
+            INSERT INTO daily_stats (day, app_type, status, count) VALUES (date(?), ?, ?, ?)
+            ON CONFLICT (day, app_type, status) DO UPDATE SET count = count + excluded.count
+        ''', [(created_at, app_type, status, delta) for created_at, app_type, status, _ in rows])
+        self.cursor.executemany('''
+            INSERT INTO booked_stats (day, status, count) VALUES (?, ?, ?)
+            ON CONFLICT (day, status) DO UPDATE SET count = count + excluded.count
+        ''', [(date, status, delta) for _, _, status, date in rows if date])
+    
+    def _rollup_rows(self, app_ids):
+        placeholders = ','.join('?' * len(app_ids))
+        self.cursor.execute(f'''
+            SELECT created_at, app_type, status, appointment_date
+            FROM applications WHERE id IN ({placeholders})
+        ''', list(app_ids))
+        return self.cursor.fetchall()
+    
     def add_application(self, user_id, username, full_name, contact_data, app_type, message, appointment_date=None, appointment_time=None):
         try:
             self.cursor.execute('''
@@ -40,9 +109,12 @@ class Database:
                 (user_id, username, full_name, contact_data, app_type, message, appointment_date, appointment_time)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (user_id, username, full_name, contact_data, app_type, message, appointment_date, appointment_time))
+            app_id = self.cursor.lastrowid
+            self._bump_rollups(self._rollup_rows([app_id]), 1)
             self.conn.commit()
-            return self.cursor.lastrowid
+            return app_id
         except:
+            self.conn.rollback()
             return None
     
     def add_reminder(self, app_id, reminder_date):
@@ -76,30 +148,162 @@ class Database:
             return []
     
     def get_applications(self, status='new'):
-        self.cursor.execute('SELECT * FROM applications WHERE status = ? ORDER BY created_at DESC', (status,))
+        self.cursor.execute('SELECT * FROM applications WHERE status = ? ORDER BY created_at DESC, id DESC', (status,))
         return self.cursor.fetchall()
     
     def get_all_applications(self):
-        self.cursor.execute('SELECT * FROM applications ORDER BY created_at DESC')
+        self.cursor.execute('SELECT * FROM applications ORDER BY created_at DESC, id DESC')
         return self.cursor.fetchall()
     
     def get_application_by_id(self, app_id):
+        app = self.cache.get(app_id)
+        if app:
+            return app
         self.cursor.execute('SELECT * FROM applications WHERE id = ?', (app_id,))
+        app = self.cursor.fetchone()
+        if app:
+            self.cache.put(app_id, app)
+        return app
+    
+    def get_user_applications(self, user_id, limit=5, offset=0):
+        """Заявки пользователя постранично, новые сверху"""
+        self.cursor.execute('''
+            SELECT * FROM applications WHERE user_id = ?
+            ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?
+        ''', (user_id, limit, offset))
+        return self.cursor.fetchall()
+    
+    def count_user_applications(self, user_id):
+        self.cursor.execute('SELECT COUNT(*) FROM applications WHERE user_id = ?', (user_id,))
+        return self.cursor.fetchone()[0]
+    
+    def find_open_application(self, user_id, app_type):
+        """Необработанная заявка пользователя того же типа или None"""
+        self.cursor.execute('''
+            SELECT * FROM applications WHERE user_id = ? AND app_type = ? AND status = 'new'
+            ORDER BY created_at DESC, id DESC LIMIT 1
+        ''', (user_id, app_type))
         return self.cursor.fetchone()
     
+    def _new_ids(self, app_ids, dated=False):
+        """Id из app_ids, которые ещё существуют и имеют статус new (dated - и дату записи)"""
+        placeholders = ','.join('?' * len(app_ids))
+        condition = ' AND appointment_date IS NOT NULL' if dated else ''
+        self.cursor.execute(f"SELECT id FROM applications WHERE id IN ({placeholders}) AND status = 'new'{condition}", list(app_ids))
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def _patch_cached(self, app_ids, fields):
+        """Обновить закэшированные строки после записи: fields = {индекс колонки: значение}"""
+        def patch(app):
+            row = list(app)
+            for index, value in fields.items():
+                row[index] = value
+            return tuple(row)
+        for app_id in app_ids:
+            self.cache.update(app_id, patch)
+    
+    def cache_stats(self):
+        return self.cache.stats()
+    
     def update_status(self, app_id, status):
+        self._bump_rollups(self._rollup_rows([app_id]), -1)
         self.cursor.execute('UPDATE applications SET status = ? WHERE id = ?', (status, app_id))
+        self._bump_rollups(self._rollup_rows([app_id]), 1)
         self.conn.commit()
+        self._patch_cached([app_id], {10: status})
     
     def delete_application(self, app_id):
+        self._bump_rollups(self._rollup_rows([app_id]), -1)
         self.cursor.execute('DELETE FROM reminders WHERE application_id = ?', (app_id,))
         self.cursor.execute('DELETE FROM applications WHERE id = ?', (app_id,))
         self.conn.commit()
+        self.cache.pop(app_id)
+    
+    def cancel_application(self, app_id):
+        """Отменить заявку и её напоминания одной транзакцией"""
+        try:
+            self._bump_rollups(self._rollup_rows([app_id]), -1)
+            self.cursor.execute("UPDATE applications SET status = 'cancelled' WHERE id = ?", (app_id,))
+            self.cursor.execute('DELETE FROM reminders WHERE application_id = ?', (app_id,))
+            self._bump_rollups(self._rollup_rows([app_id]), 1)
+            self.conn.commit()
+            self._patch_cached([app_id], {10: 'cancelled'})
+            return True
+        except:
+            self.conn.rollback()
+            return False
+    
+    def bulk_update_status(self, app_ids, status):
+        """Изменить статус нескольких новых заявок одной транзакцией, вернуть их число или None при ошибке"""
+        try:
+            # Пока админ выбирал, заявку могли отменить или обработать
+            app_ids = self._new_ids(app_ids)
+            self._bump_rollups(self._rollup_rows(app_ids), -1)
+            self.cursor.executemany('UPDATE applications SET status = ? WHERE id = ?', [(status, app_id) for app_id in app_ids])
+            self._bump_rollups(self._rollup_rows(app_ids), 1)
+            self.conn.commit()
+            self._patch_cached(app_ids, {10: status})
+            return len(app_ids)
+        except:
+            self.conn.rollback()
+            return None
+    
+    def bulk_delete(self, app_ids):
+        """Удалить несколько новых заявок вместе с напоминаниями одной транзакцией, вернуть их число или None при ошибке"""
+        try:
+            app_ids = self._new_ids(app_ids)
+            self._bump_rollups(self._rollup_rows(app_ids), -1)
+            params = [(app_id,) for app_id in app_ids]
+            self.cursor.executemany('DELETE FROM reminders WHERE application_id = ?', params)
+            self.cursor.executemany('DELETE FROM applications WHERE id = ?', params)
+            self.conn.commit()
+            for app_id in app_ids:
+                self.cache.pop(app_id)
+            return len(app_ids)
+        except:
+            self.conn.rollback()
+            return None
+    
+    def bulk_reschedule(self, app_ids, appointment_date, appointment_time, reminder_date):
+        """Перенести несколько новых заявок с датой записи на новую дату и пересоздать напоминания
+        одной транзакцией, вернуть их число или None при ошибке"""
+        try:
+            # Заявки без даты (вопросы и прочее) переносить некуда
+            app_ids = self._new_ids(app_ids, dated=True)
+            self._bump_rollups(self._rollup_rows(app_ids), -1)
+            params = [(app_id,) for app_id in app_ids]
+            self.cursor.executemany(
+                'UPDATE applications SET appointment_date = ?, appointment_time = ? WHERE id = ?',
+                [(appointment_date, appointment_time, app_id) for app_id in app_ids]
+            )
+            self.cursor.executemany('DELETE FROM reminders WHERE application_id = ?', params)
+            self.cursor.executemany('INSERT INTO reminders (application_id, reminder_date) VALUES (?, ?)', [(app_id, reminder_date) for app_id in app_ids])
+            self._bump_rollups(self._rollup_rows(app_ids), 1)
+            self.conn.commit()
+            self._patch_cached(app_ids, {7: appointment_date, 8: appointment_time})
+            return len(app_ids)
+        except:
+            self.conn.rollback()
+            return None
     
     def get_stats(self):
-        self.cursor.execute('SELECT COUNT(*) FROM applications')
-        total = self.cursor.fetchone()[0]
-        self.cursor.execute("SELECT COUNT(*) FROM applications WHERE status = 'new'")
-        new = self.cursor.fetchone()[0]
-        processed = total - new
-        return {'total': total, 'new': new, 'processed': processed}
+        self.cursor.execute('SELECT status, COUNT(*) FROM applications GROUP BY status')
+        counts = dict(self.cursor.fetchall())
+        return {
+            'total': sum(counts.values()),
+            'new': counts.get('new', 0),
+            'processed': counts.get('processed', 0),
+            'cancelled': counts.get('cancelled', 0)
+        }
+    
+    def get_rollups(self, date_from, date_to):
+        self.cursor.execute('''
+            SELECT day, app_type, status, count FROM daily_stats
+            WHERE day BETWEEN ? AND ? AND count > 0
+        ''', (date_from, date_to))
+        daily_rows = self.cursor.fetchall()
+        self.cursor.execute('''
+            SELECT day, status, count FROM booked_stats
+            WHERE day BETWEEN ? AND ? AND count > 0
+        ''', (date_from, date_to))
+        return daily_rows, self.cursor.fetchall()
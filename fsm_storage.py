@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+
+class SessionRecord:
+    __slots__ = ('state', 'data', 'touched')
+    
+    def __init__(self):
+        self.state = None
+        self.data = {}
+        self.touched = time.monotonic()
+
+class TTLMemoryStorage(BaseStorage):
+    """FSM-хранилище в памяти, которое забывает брошенные анкеты.
+    
+    Сессии истекают после ttl секунд без активности, а при превышении max_sessions
+    вытесняются самые давние. Ключи истёкших анкет помнятся (не больше max_sessions)
+    до следующего сообщения пользователя, чтобы на него ответить, что анкету нужно
+    начать заново.
+    """
+    
+    def __init__(self, ttl=3600, max_sessions=10000, sweep_interval=60):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.records = OrderedDict()  # StorageKey -> SessionRecord, давние в начале
+        self.expired = OrderedDict()  # StorageKey -> пользователь уже писал после истечения
+        self.expired_count = 0
+        self.evicted_count = 0
+    
+    def _forget(self, key, record):
+        del self.records[key]
+        # Сообщать об истечении есть смысл только посреди анкеты
+        if record.state:
+            self.expired[key] = False
+            self.expired.move_to_end(key)
+            if len(self.expired) > self.max_sessions:
+                self.expired.popitem(last=False)
+    
+    def _get(self, key, create=False):
+        record = self.records.get(key)
+        now = time.monotonic()
+        if record and now - record.touched > self.ttl:
+            self._forget(key, record)
+            self.expired_count += 1
+            record = None
+        if record is None:
+            if not create:
+                return None
+            record = self.records[key] = SessionRecord()
+            while len(self.records) > self.max_sessions:
+                old_key, old_record = next(iter(self.records.items()))
+                self._forget(old_key, old_record)
+                self.evicted_count += 1
+        record.touched = now
+        self.records.move_to_end(key)
+        return record
+    
+    def _drop_if_empty(self, key, record):
+        # После state.clear() запись не нужна
+        if record.state is None and not record.data:
+            del self.records[key]
+    
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        record = self._get(key, create=state is not None)
+        if record is None:
+            return
+        record.state = state
+        if state is not None:
+            self.expired.pop(key, None)
+        self._drop_if_empty(key, record)
+    
+    async def get_state(self, key):
+        record = self._get(key)
+        if record is None and key in self.expired:
+            # Отметка живёт одно сообщение: если его обработал не session_expired
+            # (например, /start), на следующих сообщениях она уже не нужна
+            if self.expired[key]:
+                del self.expired[key]
+            else:
+                self.expired[key] = True
+        return record.state if record else None
+    
+    async def set_data(self, key, data):
+        record = self._get(key, create=bool(data))
+        if record is None:
+            return
+        record.data = dict(data)
+        self._drop_if_empty(key, record)
+    
+    async def get_data(self, key):
+        record = self._get(key)
+        return record.data.copy() if record else {}
+    
+    async def close(self):
+        pass
+    
+    def pop_expired(self, key):
+        """True, если анкета этого пользователя истекла и об этом ещё не сообщали"""
+        if key in self.expired:
+            del self.expired[key]
+            return True
+        return False
+    
+    def sweep(self):
+        """Удалить истёкшие сессии: они лежат в начале, так как доступ переносит запись в конец"""
+        deadline = time.monotonic() - self.ttl
+        while self.records:
+            key, record = next(iter(self.records.items()))
+            if record.touched > deadline:
+                break
+            self._forget(key, record)
+            self.expired_count += 1
+    
+    async def sweeper(self):
+        """Фоновая очистка истёкших сессий"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+    
+    def stats(self):
+        return {'active': len(self.records), 'expired': self.expired_count, 'evicted': self.evicted_count}
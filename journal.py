@@ -0,0 +1,164 @@
+import asyncio
+import json
+import sqlite3
+
+from aiogram import BaseMiddleware
+
+class UpdateJournal:
+    """Журнал входящих апдейтов, чтобы перезапуск не терял то, что прислали пользователи.
+    
+    Апдейт записывается до обработки и помечается выполненным после. Записи копятся
+    и сбрасываются одной транзакцией на пачку апдейтов, пришедших вместе.
+    """
+    
+    def __init__(self, db_name='updates.db', keep_hours=24):
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS update_journal (
+                update_id INTEGER PRIMARY KEY,
+                payload TEXT,
+                done INTEGER DEFAULT 0,
+                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                attempts INTEGER DEFAULT 0
+            )
+        ''')
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(update_journal)')]
+        if 'attempts' not in columns:
+            self.conn.execute('ALTER TABLE update_journal ADD COLUMN attempts INTEGER DEFAULT 0')
+        self.conn.commit()
+        self.keep_hours = keep_hours
+        self.pending = {}      # update_id -> (payload, future) ждут записи
+        self.finished = []     # update_id обработанных, ждут отметки
+        self.in_flight = set() # update_id, которые обрабатываются сейчас
+        self.replaying = set() # update_id, которые переигрываются после запуска
+        self.replay_tasks = set()
+        self.flush_scheduled = False
+    
+    def _schedule_flush(self):
+        # Апдейты одной пачки getUpdates запускаются в одной итерации цикла,
+        # поэтому сброс на следующей итерации пишет их вместе
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+    
+    def flush(self):
+        """Записать накопленные апдейты и отметки одной транзакцией"""
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, {}
+        finished, self.finished = self.finished, []
+        done_before = set()
+        try:
+            if pending:
+                ids = list(pending)
+                placeholders = ','.join('?' * len(ids))
+                done_before = {row[0] for row in self.conn.execute(
+                    f'SELECT update_id FROM update_journal WHERE done = 1 AND update_id IN ({placeholders})', ids
+                )}
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO update_journal (update_id, payload) VALUES (?, ?)',
+                    [(update_id, payload) for update_id, (payload, _) in pending.items()]
+                )
+            if finished:
+                self.conn.executemany('UPDATE update_journal SET done = 1 WHERE update_id = ?', [(update_id,) for update_id in finished])
+            self.conn.commit()
+        except Exception as e:
+            # Журнал не должен мешать обработке: апдейт всё равно обрабатывается
+            print(f"❌ Ошибка записи журнала апдейтов: {e}")
+        for update_id, (_, future) in pending.items():
+            if not future.done():
+                future.set_result(update_id not in done_before)
+    
+    async def begin(self, update):
+        """Записать апдейт в журнал, вернуть False, если он уже обработан или обрабатывается"""
+        update_id = update.update_id
+        if update_id in self.in_flight:
+            return False
+        self.in_flight.add(update_id)
+        if update_id in self.replaying:
+            return True
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = (update.model_dump_json(exclude_none=True), future)
+        self._schedule_flush()
+        if not await future:
+            self.in_flight.discard(update_id)
+            return False
+        return True
+    
+    def finish(self, update_id):
+        self.in_flight.discard(update_id)
+        self.replaying.discard(update_id)
+        self.finished.append(update_id)
+        self._schedule_flush()
+    
+    async def _replay_one(self, dp, bot, update_id, update):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            print(f"❌ Ошибка повторной обработки апдейта {update_id}: {e}")
+    
+    def replay(self, dp, bot, skip_commands=(), max_attempts=3):
+        """Запустить в фоне обработку апдейтов, записанных до перезапуска, но так и не обработанных.
+        
+        Апдейты обрабатываются параллельно и не задерживают приём новых. Команды из
+        skip_commands не повторяются, а апдейт, уже max_attempts раз переживший
+        перезапуск (например, роняющий процесс), помечается обработанным.
+        """
+        rows = self.conn.execute('SELECT update_id, payload, attempts FROM update_journal WHERE done = 0 ORDER BY update_id').fetchall()
+        replay, dropped = [], []
+        for update_id, payload, attempts in rows:
+            update = json.loads(payload)
+            text = (update.get('message') or {}).get('text') or ''
+            command = text.split()[0].split('@')[0] if text.startswith('/') else None
+            if attempts >= max_attempts or command in skip_commands:
+                dropped.append(update_id)
+            else:
+                replay.append((update_id, update))
+        # Попытка засчитывается до обработки, иначе падение процесса её не отметит
+        self.conn.executemany('UPDATE update_journal SET done = 1 WHERE update_id = ?', [(update_id,) for update_id in dropped])
+        self.conn.executemany('UPDATE update_journal SET attempts = attempts + 1 WHERE update_id = ?', [(update_id,) for update_id, _ in replay])
+        self.conn.commit()
+        
+        for update_id, update in replay:
+            self.replaying.add(update_id)
+            task = asyncio.create_task(self._replay_one(dp, bot, update_id, update))
+            self.replay_tasks.add(task)
+            task.add_done_callback(self.replay_tasks.discard)
+        if replay:
+            print(f"🔁 Повторно обрабатывается апдейтов: {len(replay)}")
+        if dropped:
+            print(f"⏭ Пропущено апдейтов: {len(dropped)}")
+        return len(replay)
+    
+    def compact(self):
+        """Удалить обработанные записи старше keep_hours часов"""
+        self.conn.execute(
+            "DELETE FROM update_journal WHERE done = 1 AND received_at < datetime('now', ?)",
+            (f'-{self.keep_hours} hours',)
+        )
+        self.conn.commit()
+    
+    async def compactor(self, interval=3600):
+        """Фоновое сжатие журнала"""
+        while True:
+            await asyncio.sleep(interval)
+            self.compact()
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+class JournalMiddleware(BaseMiddleware):
+    """Пропускает апдейт через журнал: запись до обработки, отметка после"""
+    
+    def __init__(self, journal):
+        self.journal = journal
+    
+    async def __call__(self, handler, event, data):
+        if not await self.journal.begin(event):
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            self.journal.finish(event.update_id)
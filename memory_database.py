@@ -0,0 +1,170 @@
+import bisect
+from datetime import datetime, timezone
+
+from storage import Storage
+
+class MemoryDatabase(Storage):
+    """Хранилище в памяти с индексами - для тестов и замеров обработчиков без дискового I/O"""
+    
+    def __init__(self):
+        self.applications = {}       # id -> строка заявки в формате таблицы applications
+        self.by_created = []         # [(created_at, id)] по возрастанию
+        self.by_status = {}          # status -> [(created_at, id)] по возрастанию
+        self.by_user = {}            # user_id -> [(created_at, id)] по возрастанию
+        self.reminders = {}          # id -> [application_id, reminder_date, sent]
+        self.reminders_by_app = {}   # application_id -> {reminder_id}
+        self.pending_reminders = []  # [(reminder_date, reminder_id)] непосланных по возрастанию
+        self.daily_stats = {}        # (day, app_type, status) -> count
+        self.booked_stats = {}       # (day, status) -> count
+        self.next_app_id = 1
+        self.next_reminder_id = 1
+    
+    def _index(self, app, delta):
+        """Добавить (delta=1) или убрать (delta=-1) заявку из индексов и агрегатов"""
+        key = (app[9], app[0])
+        status_index = self.by_status.setdefault(app[10], [])
+        user_index = self.by_user.setdefault(app[1], [])
+        for index in (self.by_created, status_index, user_index):
+            if delta > 0:
+                bisect.insort(index, key)
+            else:
+                index.pop(bisect.bisect_left(index, key))
+    
+        daily_key = (app[9][:10], app[5], app[10])
+        self.daily_stats[daily_key] = self.daily_stats.get(daily_key, 0) + delta
+        if app[7]:
+            booked_key = (app[7], app[10])
+            self.booked_stats[booked_key] = self.booked_stats.get(booked_key, 0) + delta
+    
+    def _replace(self, app_id, **fields):
+        app = self.applications.get(app_id)
+        if not app:
+            return
+        self._index(app, -1)
+        row = list(app)
+        if 'status' in fields:
+            row[10] = fields['status']
+        if 'appointment_date' in fields:
+            row[7] = fields['appointment_date']
+            row[8] = fields['appointment_time']
+        self.applications[app_id] = tuple(row)
+        self._index(self.applications[app_id], 1)
+    
+    def _delete_reminders(self, app_id):
+        for reminder_id in self.reminders_by_app.pop(app_id, ()):
+            _, reminder_date, sent = self.reminders.pop(reminder_id)
+            if not sent:
+                key = (reminder_date, reminder_id)
+                self.pending_reminders.pop(bisect.bisect_left(self.pending_reminders, key))
+    
+    def add_application(self, user_id, username, full_name, contact_data, app_type, message, appointment_date=None, appointment_time=None):
+        app_id = self.next_app_id
+        self.next_app_id += 1
+        # Как CURRENT_TIMESTAMP в SQLite - UTC
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        app = (app_id, user_id, username, full_name, contact_data, app_type, message, appointment_date, appointment_time, created_at, 'new')
+        self.applications[app_id] = app
+        self._index(app, 1)
+        return app_id
+    
+    def get_applications(self, status='new'):
+        return [self.applications[app_id] for _, app_id in reversed(self.by_status.get(status, []))]
+    
+    def get_all_applications(self):
+        return [self.applications[app_id] for _, app_id in reversed(self.by_created)]
+    
+    def get_application_by_id(self, app_id):
+        return self.applications.get(app_id)
+    
+    def update_status(self, app_id, status):
+        self._replace(app_id, status=status)
+    
+    def delete_application(self, app_id):
+        self._delete_reminders(app_id)
+        app = self.applications.pop(app_id, None)
+        if app:
+            self._index(app, -1)
+    
+    def cancel_application(self, app_id):
+        self._replace(app_id, status='cancelled')
+        self._delete_reminders(app_id)
+        return True
+    
+    def get_user_applications(self, user_id, limit=5, offset=0):
+        index = self.by_user.get(user_id, [])
+        end = len(index) - offset
+        return [self.applications[app_id] for _, app_id in reversed(index[max(0, end - limit):max(0, end)])]
+    
+    def count_user_applications(self, user_id):
+        return len(self.by_user.get(user_id, []))
+    
+    def find_open_application(self, user_id, app_type):
+        for _, app_id in reversed(self.by_user.get(user_id, [])):
+            app = self.applications[app_id]
+            if app[5] == app_type and app[10] == 'new':
+                return app
+        return None
+    
+    def _new_ids(self, app_ids, dated=False):
+        apps = [self.applications.get(app_id) for app_id in app_ids]
+        return [app[0] for app in apps if app and app[10] == 'new' and (app[7] or not dated)]
+    
+    def bulk_update_status(self, app_ids, status):
+        app_ids = self._new_ids(app_ids)
+        for app_id in app_ids:
+            self._replace(app_id, status=status)
+        return len(app_ids)
+    
+    def bulk_delete(self, app_ids):
+        app_ids = self._new_ids(app_ids)
+        for app_id in app_ids:
+            self.delete_application(app_id)
+        return len(app_ids)
+    
+    def bulk_reschedule(self, app_ids, appointment_date, appointment_time, reminder_date):
+        app_ids = self._new_ids(app_ids, dated=True)
+        for app_id in app_ids:
+            self._replace(app_id, appointment_date=appointment_date, appointment_time=appointment_time)
+            self._delete_reminders(app_id)
+            self.add_reminder(app_id, reminder_date)
+        return len(app_ids)
+    
+    def add_reminder(self, app_id, reminder_date):
+        reminder_id = self.next_reminder_id
+        self.next_reminder_id += 1
+        self.reminders[reminder_id] = [app_id, reminder_date, 0]
+        self.reminders_by_app.setdefault(app_id, set()).add(reminder_id)
+        bisect.insort(self.pending_reminders, (reminder_date, reminder_id))
+    
+    def mark_reminder_sent(self, reminder_id):
+        reminder = self.reminders.get(reminder_id)
+        if reminder and not reminder[2]:
+            reminder[2] = 1
+            key = (reminder[1], reminder_id)
+            self.pending_reminders.pop(bisect.bisect_left(self.pending_reminders, key))
+        return True
+    
+    def get_due_reminders(self):
+        today = datetime.now().strftime('%Y-%m-%d')
+        end = bisect.bisect_right(self.pending_reminders, (today, float('inf')))
+        due = []
+        for _, reminder_id in self.pending_reminders[:end]:
+            app = self.applications.get(self.reminders[reminder_id][0])
+            if app and app[7]:
+                due.append((app[0], reminder_id, app[1], app[2]))
+        return due
+    
+    def get_stats(self):
+        return {
+            'total': len(self.applications),
+            'new': len(self.by_status.get('new', [])),
+            'processed': len(self.by_status.get('processed', [])),
+            'cancelled': len(self.by_status.get('cancelled', []))
+        }
+    
+    def get_rollups(self, date_from, date_to):
+        daily_rows = [(day, app_type, status, count) for (day, app_type, status), count in self.daily_stats.items()
+                      if date_from <= day <= date_to and count > 0]
+        booked_rows = [(day, status, count) for (day, status), count in self.booked_stats.items()
+                       if date_from <= day <= date_to and count > 0]
+        return daily_rows, booked_rows
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class SamplingProfiler:
+    """Семплирующий профилировщик потока event loop без перезапуска бота.
+    
+    Пока не запущен, ничего не стоит: отдельный поток снимает стек только на время run().
+    Медленные колбэки находятся по пульсу: поток ставит в цикл пустой колбэк и, если
+    цикл не выполнил его дольше slow_callback, запоминает стеки, снятые за это время.
+    Режим отладки asyncio не включается - он сам замедляет каждый колбэк.
+    """
+    
+    def __init__(self, interval=0.005, slow_callback=0.1, top=20):
+        self.interval = interval
+        self.slow_callback = slow_callback
+        self.top = top
+        self.running = False
+    
+    def _sample(self, loop, thread_id, stop, stacks, slow_callbacks):
+        heartbeat = {'sent': None, 'ran': None}
+        stall = Counter()  # стеки, снятые пока пульс не выполнен дольше порога
+    
+        def beat():
+            heartbeat['ran'] = time.perf_counter()
+    
+        def finish_stall(lag):
+            if lag > self.slow_callback:
+                slow_callbacks.append((lag, stall.most_common(1)[0][0] if stall else ''))
+            stall.clear()
+    
+        while not stop.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            collapsed = ';'.join(reversed(stack))
+            if stack:
+                stacks[collapsed] += 1
+    
+            if heartbeat['sent'] is not None and heartbeat['ran'] is not None:
+                finish_stall(heartbeat['ran'] - heartbeat['sent'])
+                heartbeat['sent'] = None
+            if heartbeat['sent'] is None:
+                heartbeat['sent'], heartbeat['ran'] = now, None
+                loop.call_soon_threadsafe(beat)
+            elif stack and now - heartbeat['sent'] > self.slow_callback:
+                stall[collapsed] += 1
+    
+        # Остановка приходит из цикла, значит затянувшийся шаг уже закончился
+        if heartbeat['sent'] is not None:
+            finish_stall((heartbeat['ran'] or time.perf_counter()) - heartbeat['sent'])
+    
+    async def run(self, seconds):
+        """Профилировать текущий event loop seconds секунд, вернуть (отчёт, collapsed-стеки)"""
+        if self.running:
+            return None
+        self.running = True
+    
+        loop = asyncio.get_running_loop()
+        stacks = Counter()
+        slow_callbacks = []
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample, args=(loop, threading.get_ident(), stop, stacks, slow_callbacks), daemon=True
+        )
+    
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            sampler.join()
+            self.running = False
+    
+        elapsed = time.perf_counter() - started
+        return self._report(stacks, slow_callbacks, elapsed), self._collapsed(stacks)
+    
+    def _report(self, stacks, slow_callbacks, elapsed):
+        total = sum(stacks.values())
+        busy_total = 0
+        own = Counter()
+        cumulative = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            # Ожидание событий в селекторе - простой цикла, а не работа
+            if '(selectors.py:' in frames[-1]:
+                continue
+            busy_total += count
+            own[frames[-1]] += count
+            for frame in set(frames):
+                cumulative[frame] += count
+    
+        lines = [
+            f"Профиль за {elapsed:.1f} с, семплов: {total}, шаг {self.interval * 1000:.0f} мс",
+            f"Цикл занят: {busy_total * 100 // total if total else 0}% семплов",
+            "",
+            f"Топ-{self.top} по собственному времени:",
+        ]
+        for frame, count in own.most_common(self.top):
+            lines.append(f"{count * 100 / busy_total:6.1f}%  {count:6d}  {frame}")
+        lines += ["", f"Топ-{self.top} по включённому времени:"]
+        for frame, count in cumulative.most_common(self.top):
+            lines.append(f"{count * 100 / busy_total:6.1f}%  {count:6d}  {frame}")
+        lines += ["", f"Медленные колбэки (> {self.slow_callback * 1000:.0f} мс): {len(slow_callbacks)}"]
+        for lag, stack in slow_callbacks:
+            frames = stack.split(';') if stack else []
+            # Кадры самого цикла до Handle._run неинтересны, показываем код колбэка
+            runs = [i for i, frame in enumerate(frames) if frame.startswith('Handle._run (')]
+            if runs:
+                frames = frames[runs[-1] + 1:]
+            lines.append(f"{lag * 1000:6.0f} мс  {' -> '.join(frames) or 'стек не снят'}")
+        return '\n'.join(lines)
+    
+    def _collapsed(self, stacks):
+        """Стеки в формате flamegraph.pl / speedscope: "f1;f2;f3 count" """
+        return '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
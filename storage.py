@@ -0,0 +1,146 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+
+# Порядок полей в строке заявки, на который опираются обработчики:
+# (id, user_id, username, full_name, contact_data, app_type, message,
+#  appointment_date, appointment_time, created_at, status)
+
+class LRUCache:
+    """Ограниченный по размеру кэш с вытеснением давно не использованных записей"""
+    
+    def __init__(self, size=256):
+        self.size = size
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        value = self.items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+    
+    def update(self, key, fn):
+        """Заменить значение на fn(значение), если ключ в кэше; порядок и счётчики не меняются"""
+        value = self.items.get(key)
+        if value is not None:
+            self.items[key] = fn(value)
+    
+    def pop(self, key):
+        self.items.pop(key, None)
+    
+    def stats(self):
+        return {'size': len(self.items), 'max_size': self.size, 'hits': self.hits, 'misses': self.misses}
+
+class Storage(ABC):
+    """Общий интерфейс хранилища заявок, напоминаний и статистики"""
+    
+    # Заявки
+    @abstractmethod
+    def add_application(self, user_id, username, full_name, contact_data, app_type, message, appointment_date=None, appointment_time=None):
+        """Добавить заявку, вернуть её id или None при ошибке"""
+    
+    @abstractmethod
+    def get_applications(self, status='new'):
+        """Заявки с указанным статусом, новые сверху"""
+    
+    @abstractmethod
+    def get_all_applications(self):
+        """Все заявки, новые сверху"""
+    
+    @abstractmethod
+    def get_application_by_id(self, app_id):
+        """Заявка по id или None"""
+    
+    @abstractmethod
+    def update_status(self, app_id, status):
+        """Изменить статус заявки"""
+    
+    @abstractmethod
+    def delete_application(self, app_id):
+        """Удалить заявку вместе с напоминаниями"""
+    
+    @abstractmethod
+    def cancel_application(self, app_id):
+        """Отменить заявку пользователем и удалить её напоминания, вернуть True при успехе"""
+    
+    @abstractmethod
+    def get_user_applications(self, user_id, limit=5, offset=0):
+        """Страница заявок пользователя, новые сверху"""
+    
+    @abstractmethod
+    def count_user_applications(self, user_id):
+        """Число заявок пользователя"""
+    
+    @abstractmethod
+    def find_open_application(self, user_id, app_type):
+        """Необработанная заявка пользователя того же типа или None"""
+    
+    @abstractmethod
+    def bulk_update_status(self, app_ids, status):
+        """Изменить статус нескольких заявок со статусом new атомарно, вернуть их число или None при ошибке"""
+    
+    @abstractmethod
+    def bulk_delete(self, app_ids):
+        """Удалить несколько заявок со статусом new с напоминаниями атомарно, вернуть их число или None при ошибке"""
+    
+    @abstractmethod
+    def bulk_reschedule(self, app_ids, appointment_date, appointment_time, reminder_date):
+        """Перенести несколько заявок со статусом new и датой записи, пересоздать напоминания атомарно, вернуть их число или None при ошибке"""
+    
+    # Напоминания
+    @abstractmethod
+    def add_reminder(self, app_id, reminder_date):
+        """Добавить напоминание на дату YYYY-MM-DD"""
+    
+    @abstractmethod
+    def mark_reminder_sent(self, reminder_id):
+        """Пометить напоминание как отправленное"""
+    
+    @abstractmethod
+    def get_due_reminders(self):
+        """Непосланные напоминания на сегодня или ранее: (app_id, reminder_id, user_id, username)"""
+    
+    # Статистика
+    @abstractmethod
+    def get_stats(self):
+        """Счётчики {'total', 'new', 'processed', 'cancelled'}"""
+    
+    @abstractmethod
+    def get_rollups(self, date_from, date_to):
+        """Строки агрегатов за период: ([(day, app_type, status, count)], [(day, status, count)])"""
+    
+    def cache_stats(self):
+        """Счётчики кэша заявок {'size', 'max_size', 'hits', 'misses'} или None, если кэша нет"""
+        return None
+    
+    def get_daily_report(self, date_from, date_to):
+        """Дневная статистика за период (даты в формате YYYY-MM-DD) только из агрегатов"""
+        daily_rows, booked_rows = self.get_rollups(date_from, date_to)
+        days = {}
+        for day, app_type, status, count in daily_rows:
+            stats = days.setdefault(day, {'total': 0, 'new': 0, 'processed': 0, 'cancelled': 0, 'types': {}, 'booked': 0, 'no_show': 0})
+            stats['total'] += count
+            if status in ('new', 'processed', 'cancelled'):
+                stats[status] += count
+            stats['types'][app_type] = stats['types'].get(app_type, 0) + count
+        today = datetime.now().strftime('%Y-%m-%d')
+        for day, status, count in booked_rows:
+            stats = days.setdefault(day, {'total': 0, 'new': 0, 'processed': 0, 'cancelled': 0, 'types': {}, 'booked': 0, 'no_show': 0})
+            stats['booked'] += count
+            # Необработанная запись на прошедшую дату считается неявкой
+            if status == 'new' and day < today:
+                stats['no_show'] += count
+        return days
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from backup import BackupManager
+from database import Database
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'applications.db')
+    db = Database(path)
+    for i in range(300):
+        db.add_application(i, 'user', 'Иван', 'ivan_user', 'вопрос', 'текст ' * 100)
+    db.conn.close()
+    return path
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM applications').fetchone()[0]
+    finally:
+        conn.close()
+
+def snapshots(manager):
+    return sorted(os.listdir(manager.backup_dir))
+
+def test_backup(db_path):
+    manager = BackupManager(db_path, keep=2)
+    result = asyncio.run(manager.backup())
+    assert result['ok'] and result['restarts'] == 0 and not result['one_step']
+    assert count_rows(result['path']) == 300
+    assert snapshots(manager) == [os.path.basename(result['path'])]
+
+def test_backup_during_writes(db_path):
+    # Бот пишет через своё соединение, каждая запись отправляет копирование на начало
+    db = Database(db_path)
+    stop = threading.Event()
+    
+    def writer():
+        while not stop.is_set():
+            db.update_status(1, 'processed')
+            db.update_status(1, 'new')
+            stop.wait(0.001)
+    
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        manager = BackupManager(db_path, pages=1, pause=0.005, max_restarts=3)
+        result = asyncio.run(asyncio.wait_for(manager.backup(), 10))
+    finally:
+        stop.set()
+        thread.join()
+    assert result['ok'] and result['one_step']
+    assert result['restarts'] == 3
+    assert count_rows(result['path']) == 300
+    assert not manager.lock.locked()
+
+def test_backup_time_limit(db_path):
+    manager = BackupManager(db_path, pages=1, max_time=0)
+    result = asyncio.run(manager.backup())
+    assert result['ok'] and result['one_step'] and result['restarts'] == 0
+    assert count_rows(result['path']) == 300
+
+def test_failed_backup_leaves_no_files(db_path):
+    manager = BackupManager(db_path)
+    asyncio.run(manager.backup())
+    good = snapshots(manager)
+    
+    def broken_copy(target):
+        with open(target, 'w') as f:
+            f.write('недописанный снимок')
+        raise OSError('disk full')
+    
+    manager._copy = broken_copy
+    with pytest.raises(OSError):
+        asyncio.run(manager.backup())
+    manager._copy = lambda target: {'integrity': 'bad'}
+    assert not asyncio.run(manager.backup())['ok']
+    assert snapshots(manager) == good
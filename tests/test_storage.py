@@ -0,0 +1,209 @@
+"""Общие проверки, которые должны проходить все реализации Storage"""
+import pytest
+
+from database import Database
+from memory_database import MemoryDatabase
+
+PAST = '2000-01-01'
+FUTURE = '2099-01-01'
+ALL_DAYS = ('2000-01-01', '2100-01-01')
+
+@pytest.fixture(params=['sqlite-memory', 'sqlite-file', 'memory'])
+def db(request, tmp_path):
+    if request.param == 'sqlite-memory':
+        return Database(':memory:')
+    if request.param == 'sqlite-file':
+        return Database(str(tmp_path / 'applications.db'))
+    return MemoryDatabase()
+
+def add(db, user_id=1, app_type='вопрос', date=None, time=None, message='текст'):
+    return db.add_application(user_id, 'user', 'Иван', 'ivan_user', app_type, message, date, time)
+
+def test_add_and_get(db):
+    app_id = add(db, date='2026-01-30', time='14:00')
+    app = db.get_application_by_id(app_id)
+    assert app[0] == app_id
+    assert app[1:9] == (1, 'user', 'Иван', 'ivan_user', 'вопрос', 'текст', '2026-01-30', '14:00')
+    assert app[10] == 'new'
+    assert db.get_application_by_id(999) is None
+
+def test_ids_are_sequential(db):
+    assert [add(db) for _ in range(3)] == [1, 2, 3]
+
+def test_lists_newest_first(db):
+    ids = [add(db) for _ in range(4)]
+    db.update_status(ids[1], 'processed')
+    assert [app[0] for app in db.get_all_applications()] == ids[::-1]
+    assert [app[0] for app in db.get_applications('new')] == [ids[3], ids[2], ids[0]]
+    assert [app[0] for app in db.get_applications('processed')] == [ids[1]]
+    assert db.get_applications('cancelled') == []
+
+def test_update_status(db):
+    app_id = add(db)
+    db.get_application_by_id(app_id)
+    db.update_status(app_id, 'processed')
+    assert db.get_application_by_id(app_id)[10] == 'processed'
+
+def test_delete_removes_reminders(db):
+    app_id = add(db, date=FUTURE)
+    other_id = add(db, date=FUTURE)
+    db.add_reminder(app_id, PAST)
+    db.add_reminder(other_id, PAST)
+    db.delete_application(app_id)
+    assert db.get_application_by_id(app_id) is None
+    assert [rem[0] for rem in db.get_due_reminders()] == [other_id]
+
+def test_due_reminders(db):
+    app_id = add(db, user_id=7, date=FUTURE)
+    no_date_id = add(db)
+    db.add_reminder(app_id, PAST)
+    db.add_reminder(app_id, FUTURE)
+    db.add_reminder(no_date_id, PAST)
+    due = db.get_due_reminders()
+    assert due == [(app_id, 1, 7, 'user')]
+    assert db.mark_reminder_sent(1)
+    assert db.get_due_reminders() == []
+
+def test_cancel_application(db):
+    app_id = add(db, date=FUTURE)
+    db.add_reminder(app_id, PAST)
+    assert db.cancel_application(app_id)
+    assert db.get_application_by_id(app_id)[10] == 'cancelled'
+    assert db.get_due_reminders() == []
+
+def test_bulk_update_status(db):
+    ids = [add(db) for _ in range(3)]
+    assert db.bulk_update_status(ids[:2], 'processed') == 2
+    assert [db.get_application_by_id(app_id)[10] for app_id in ids] == ['processed', 'processed', 'new']
+
+def test_bulk_delete_removes_reminders(db):
+    ids = [add(db, date=FUTURE) for _ in range(3)]
+    for app_id in ids:
+        db.add_reminder(app_id, PAST)
+    assert db.bulk_delete(ids[:2]) == 2
+    assert [app[0] for app in db.get_all_applications()] == [ids[2]]
+    assert [rem[0] for rem in db.get_due_reminders()] == [ids[2]]
+
+def test_bulk_reschedule_replaces_reminders(db):
+    ids = [add(db, date=FUTURE, time='10:00') for _ in range(2)]
+    db.add_reminder(ids[0], PAST)
+    assert db.bulk_reschedule(ids, '2026-03-03', '12:00', PAST) == 2
+    for app_id in ids:
+        assert db.get_application_by_id(app_id)[7:9] == ('2026-03-03', '12:00')
+    assert sorted(rem[0] for rem in db.get_due_reminders()) == ids
+
+def test_bulk_reschedule_skips_undated(db):
+    dated = add(db, app_type='запись', date=FUTURE, time='10:00')
+    undated = add(db)
+    assert db.bulk_reschedule([dated, undated], '2026-03-03', '12:00', PAST) == 1
+    assert db.get_application_by_id(undated)[7:9] == (None, None)
+    assert [rem[0] for rem in db.get_due_reminders()] == [dated]
+    assert db.get_daily_report('2026-03-03', '2026-03-03')['2026-03-03']['booked'] == 1
+
+def test_bulk_with_missing_id(db):
+    app_id = add(db, date=FUTURE)
+    assert db.bulk_reschedule([app_id, 999], FUTURE, None, PAST) == 1
+    assert [rem[0] for rem in db.get_due_reminders()] == [app_id]
+    assert db.bulk_delete([app_id, 999]) == 1
+    assert db.get_all_applications() == []
+    assert db.get_stats()['total'] == 0
+    assert db.bulk_update_status([app_id, 999], 'processed') == 0
+
+def test_bulk_skips_changed_applications(db):
+    # Выбор в /bulk сделан раньше: пользователь успел отменить заявку, админ - обработать
+    cancelled, processed, new = [add(db, date=FUTURE) for _ in range(3)]
+    db.cancel_application(cancelled)
+    db.update_status(processed, 'processed')
+    ids = [cancelled, processed, new]
+    assert db.bulk_reschedule(ids, '2026-03-03', None, PAST) == 1
+    assert [rem[0] for rem in db.get_due_reminders()] == [new]
+    assert db.get_application_by_id(cancelled)[7] == FUTURE
+    assert db.bulk_update_status(ids, 'processed') == 1
+    assert db.get_application_by_id(cancelled)[10] == 'cancelled'
+    assert db.bulk_delete(ids) == 0
+    assert db.get_stats() == {'total': 3, 'new': 0, 'processed': 2, 'cancelled': 1}
+
+def test_user_applications_paging(db):
+    ids = [add(db, user_id=5) for _ in range(7)]
+    add(db, user_id=6)
+    assert db.count_user_applications(5) == 7
+    assert db.count_user_applications(8) == 0
+    assert [app[0] for app in db.get_user_applications(5, 5, 0)] == ids[::-1][:5]
+    assert [app[0] for app in db.get_user_applications(5, 5, 5)] == ids[::-1][5:]
+    assert db.get_user_applications(5, 5, 10) == []
+    assert db.get_user_applications(8) == []
+
+def test_find_open_application(db):
+    first = add(db, user_id=5)
+    second = add(db, user_id=5)
+    add(db, user_id=5, app_type='запись')
+    assert db.find_open_application(5, 'вопрос')[0] == second
+    db.update_status(second, 'processed')
+    assert db.find_open_application(5, 'вопрос')[0] == first
+    db.cancel_application(first)
+    assert db.find_open_application(5, 'вопрос') is None
+    assert db.find_open_application(6, 'вопрос') is None
+
+def test_stats(db):
+    ids = [add(db) for _ in range(4)]
+    db.update_status(ids[0], 'processed')
+    db.delete_application(ids[1])
+    db.cancel_application(ids[2])
+    assert db.get_stats() == {'total': 3, 'new': 1, 'processed': 1, 'cancelled': 1}
+
+def test_rollups_follow_changes(db):
+    booked = add(db, app_type='запись', date=PAST)
+    question = add(db, app_type='вопрос')
+    deleted = add(db, app_type='вопрос')
+    db.update_status(question, 'processed')
+    db.delete_application(deleted)
+    daily_rows, booked_rows = db.get_rollups(*ALL_DAYS)
+    assert sorted(row[1:] for row in daily_rows) == [('вопрос', 'processed', 1), ('запись', 'new', 1)]
+    assert booked_rows == [(PAST, 'new', 1)]
+    
+    days = db.get_daily_report(*ALL_DAYS)
+    assert days[PAST] == {'total': 0, 'new': 0, 'processed': 0, 'cancelled': 0, 'types': {}, 'booked': 1, 'no_show': 1}
+    created = [stats for day, stats in days.items() if day != PAST]
+    assert created == [{'total': 2, 'new': 1, 'processed': 1, 'cancelled': 0, 'types': {'запись': 1, 'вопрос': 1}, 'booked': 0, 'no_show': 0}]
+    
+    db.bulk_reschedule([booked], FUTURE, None, PAST)
+    assert PAST not in db.get_daily_report(*ALL_DAYS)
+    assert db.get_daily_report(PAST, PAST) == {}
+
+def test_backends_agree():
+    results = []
+    for db in (Database(':memory:'), MemoryDatabase()):
+        ids = [add(db, user_id=i % 2, date=FUTURE if i % 2 else None) for i in range(6)]
+        for app_id in ids:
+            db.add_reminder(app_id, PAST)
+        db.bulk_update_status(ids[:2] + [999], 'processed')
+        db.bulk_reschedule(ids[2:4] + [999], '2026-03-03', None, PAST)
+        db.bulk_delete([ids[4], 999])
+        db.cancel_application(ids[5])
+        results.append((
+            db.get_all_applications(), db.get_due_reminders(), db.get_stats(),
+            db.get_user_applications(1), db.get_daily_report(*ALL_DAYS)
+        ))
+    sqlite_result, memory_result = results
+    # created_at совпадает до секунды, сравниваем всё остальное
+    strip = lambda apps: [app[:9] + app[10:] for app in apps]
+    assert strip(sqlite_result[0]) == strip(memory_result[0])
+    assert strip(sqlite_result[3]) == strip(memory_result[3])
+    assert sorted(sqlite_result[1]) == sorted(memory_result[1])
+    assert sqlite_result[2] == memory_result[2]
+    assert sqlite_result[4] == memory_result[4]
+
+def test_cache_follows_writes():
+    db = Database(':memory:', cache_size=2)
+    ids = [add(db, date=FUTURE) for _ in range(3)]
+    db.get_application_by_id(ids[0])
+    db.get_application_by_id(ids[0])
+    db.bulk_reschedule([ids[0]], '2026-03-03', '12:00', PAST)
+    db.update_status(ids[0], 'processed')
+    assert db.get_application_by_id(ids[0])[7:9] == ('2026-03-03', '12:00')
+    assert db.get_application_by_id(ids[0])[10] == 'processed'
+    db.get_application_by_id(ids[1])
+    db.get_application_by_id(ids[2])
+    assert db.cache_stats() == {'size': 2, 'max_size': 2, 'hits': 3, 'misses': 3}
+    db.delete_application(ids[2])
+    assert db.get_application_by_id(ids[2]) is None
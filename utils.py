@@ -32,3 +32,21 @@ def get_next_dates(days=7):
 
 def get_time_slots():
     return ["09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00", "18:00", "19:00", "20:00"]
+
+def get_reminder_date(date_str):
+    """Дата напоминания - за день до встречи"""
+    return (datetime.strptime(date_str, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+
+def parse_date_arg(date_str):
+    """Дата из аргумента команды: 30.01.2026 или 2026-01-30 -> 2026-01-30"""
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+def text_bar(value, max_value, width=12):
+    if max_value <= 0:
+        return ""
+    return "█" * max(1 if value else 0, round(value * width / max_value))